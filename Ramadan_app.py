@@ -1,8 +1,15 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import random
-import pandas as pd
+import io
+import csv
 from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from dataclasses import dataclass
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 # --- 1. APP CONFIGURATION ---
 st.set_page_config(page_title="Islam & Ramadan Hub 2026", page_icon="🌙", layout="wide")
@@ -12,41 +19,161 @@ st.set_page_config(page_title="Islam & Ramadan Hub 2026", page_icon="🌙", layo
 SHEET_ID = "YOUR_SHEET_ID_HERE" 
 SHEET_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/gviz/tq?tqx=out:csv"
 
+# Coordinates for the default prayer-times location
+CITY_COORDS = {("Kabala", "Sierra Leone"): (9.5876, -11.5500)}
+
+# Number of ayahs shown per page in the Quran reader
+AYAHS_PER_PAGE = 20
+
+# Sidebar prayer cards: (timing key, label, extra style)
+PRAYER_CARDS = (
+    ("Fajr", "🌅 <b>Fajr (Suhoor Ends):</b>", ""),
+    ("Dhuhr", "☀️ <b>Dhuhr:</b>", ""),
+    ("Asr", "🌥️ <b>Asr:</b>", ""),
+    ("Maghrib", "🌙 <b>Maghrib (Iftar):</b>", " style='background-color:#fff3e0;'"),
+    ("Isha", "🌌 <b>Isha:</b>", ""),
+)
+
+# Quranic vocabulary for the Vocab Builder tab
+@dataclass(slots=True, frozen=True)
+class Vocab:
+    arabic: str
+    meaning: str
+    audio_url: str
+
+VOCAB = (
+    Vocab("صَبْر", "Sabr (Patience/Perseverance)", "https://everyayah.com/data/Arabic_Words/002153.mp3"),
+    Vocab("رَحْمَة", "Rahma (Mercy)", "https://everyayah.com/data/Arabic_Words/001001.mp3"),
+    Vocab("عَلِيم", "Aleem (All-Knowing)", "https://everyayah.com/data/Arabic_Words/002032.mp3"),
+    Vocab("أَرْض", "Ardh (Earth)", "https://everyayah.com/data/Arabic_Words/002011.mp3"),
+)
+
+# The vocab list is static, so its table HTML lives with the data
+VOCAB_HTML = "<table>" + "".join(
+    f"<tr><td class='arabic-text' style='font-size: 28px;'>{v.arabic}</td><td><b>{v.meaning}</b></td></tr>" for v in VOCAB
+) + "</table>"
+
 # --- 3. CUSTOM CSS STYLING ---
-st.markdown("""
-    <style>
-    .arabic-text { font-family: 'Amiri', serif; font-size: 36px; direction: rtl; text-align: right; color: #1B5E20; line-height: 2.2; margin-bottom: 10px;}
-    .translation-text { font-size: 18px; color: #444; margin-bottom: 25px; border-left: 3px solid #4CAF50; padding-left: 15px; }
-    .card { background-color: #fdfdfd; padding: 20px; border-radius: 10px; border-left: 5px solid #00796B; margin-bottom: 20px; box-shadow: 2px 2px 10px rgba(0,0,0,0.05); }
-    .prayer-card { background-color: #e8f5e9; padding: 12px; border-radius: 8px; border-right: 5px solid #2E7D32; margin-bottom: 8px; font-size: 16px;}
-    </style>
-    """, unsafe_allow_html=True)
+@st.cache_data
+def load_css():
+    return (Path(__file__).parent / ".streamlit" / "style.css").read_text(encoding="utf-8")
+
+st.markdown(f"<style>{load_css()}</style>", unsafe_allow_html=True)
 
 # --- 4. HELPER FUNCTIONS ---
-@st.cache_data(ttl=3600)
-def get_prayer_times(city):
+# (connect, read) seconds: a hung API stalls the page for at most ~5 s per call
+TIMEOUT = (2, 3)
+# What a failed or malformed API response can raise
+FETCH_ERRORS = (requests.RequestException, ValueError, KeyError)
+
+# One pooled session shared across reruns so API calls reuse keep-alive connections
+@st.cache_resource
+def http_session():
+    s = requests.Session()
+    s.headers["User-Agent"] = "ramadan-hub"
+    # One quick retry for connection blips and 5xx; read timeouts are never retried
+    # and Retry-After is ignored, so the script thread can't be parked by the server
+    retry = Retry(total=1, read=0, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504],
+                  allowed_methods=["GET"], respect_retry_after_header=False)
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
+# One request covers the whole month; failures raise so they aren't cached
+@st.cache_data(ttl=86400 * 28, show_spinner=False)
+def get_month_timings(city, country, year, month):
+    # Known coordinates skip Aladhan's server-side geocoding of the city name
+    if (city, country) in CITY_COORDS:
+        lat, lon = CITY_COORDS[(city, country)]
+        url, params = f"https://api.aladhan.com/v1/calendar/{year}/{month}", {"latitude": lat, "longitude": lon, "method": 2}
+    else:
+        url, params = f"https://api.aladhan.com/v1/calendarByCity/{year}/{month}", {"city": city, "country": country, "method": 2}
+    res = http_session().get(url, params=params, timeout=TIMEOUT)
+    res.raise_for_status()
+    data = res.json()['data']
+    if not data: raise ValueError("Aladhan returned no calendar days")
+    # Keyed by "DD-MM-YYYY"; calendar timings carry a timezone suffix, e.g. "05:12 (GMT)"
+    days = {day['date']['gregorian']['date']: {name: t.split(" ")[0] for name, t in day['timings'].items()} for day in data}
+    return data[0]['meta']['timezone'], days
+
+def get_prayer_times(city, country):
+    now = datetime.now()
     try:
-        res = requests.get(f"https://api.aladhan.com/v1/timingsByCity?city={city}&country=Sierra%20Leone&method=2").json()
-        return res['data']['timings']
-    except: return None
+        tz, days = get_month_timings(city, country, now.year, now.month)
+        # "Today" is the city's date, which can differ from the server's near midnight;
+        # fall back to the server's date if the zone can't be resolved
+        try: today = datetime.now(ZoneInfo(tz))
+        except (ZoneInfoNotFoundError, ValueError): today = now
+        if (today.year, today.month) != (now.year, now.month):
+            tz, days = get_month_timings(city, country, today.year, today.month)
+        return days[today.strftime("%d-%m-%Y")]
+    except FETCH_ERRORS: return None
+
+# Quran text never changes, so keep it on disk across restarts (no TTL)
+@st.cache_data(persist="disk", max_entries=114, show_spinner=False)
+def get_surah(s_num):
+    res = http_session().get(f"https://api.alquran.cloud/v1/surah/{s_num}/editions/quran-uthmani,en.sahih", timeout=TIMEOUT)
+    res.raise_for_status()
+    return res.json()['data']
+
+def surah_audio_url(s_num, bitrate):
+    return f"https://cdn.islamic.network/quran/audio-surah/{bitrate}/ar.alafasy/{s_num}.mp3"
+
+# Re-rolls that land on a previously seen ayah skip the network
+@st.cache_data(ttl=604800, max_entries=512, show_spinner=False)
+def get_ayah(a_num):
+    res = http_session().get(f"https://api.alquran.cloud/v1/ayah/{a_num}/editions/quran-uthmani,en.sahih", timeout=TIMEOUT)
+    res.raise_for_status()
+    return res.json()['data']
+
+# Worker threads for background prefetching, shared across reruns
+@st.cache_resource
+def background_pool():
+    return ThreadPoolExecutor(max_workers=4)
+
+def unload_surah():
+    st.session_state.pop('surah', None)
+
+def turn_page(step):
+    st.session_state.reader_page += step
+
+# The sheet changes rarely, so reuse the parsed table for a few minutes;
+# fetch failures raise so they aren't cached
+@st.cache_data(ttl=300, show_spinner="Loading progress…")
+def get_progress_sheet():
+    res = http_session().get(SHEET_URL, timeout=TIMEOUT)
+    res.raise_for_status()
+    # Two string columns don't need pandas; st.dataframe takes a dict of columns
+    progress = {"Surah": [], "Date": []}
+    reader = csv.DictReader(io.StringIO(res.text))
+    # A private sheet answers 200 with Google's HTML login page, not our CSV
+    if not {"Surah", "Date"} <= set(reader.fieldnames or ()):
+        return progress
+    for row in reader:
+        progress["Surah"].append(row["Surah"])
+        progress["Date"].append(row["Date"])
+    return progress
 
 def load_progress():
-    try: return pd.read_csv(SHEET_URL)
-    except: return pd.DataFrame(columns=["Surah", "Date"])
+    try: return get_progress_sheet()
+    except FETCH_ERRORS: return {"Surah": [], "Date": []}
 
 # --- 5. SIDEBAR: HUB, PRAYER TIMES & IFTTT ALERTS ---
-with st.sidebar:
+# A fragment, so sidebar widgets (form, tasbeeh) rerun only the sidebar
+@st.fragment
+def sidebar_hub():
     st.title("🕌 My Deen Center")
-    city = st.text_input("Current City", "Kabala")
-    times = get_prayer_times(city)
+    # City only changes on submit, so typing doesn't refetch prayer times
+    with st.form("prayer_form"):
+        city = st.text_input("Current City", "Kabala")
+        country = st.text_input("Country", "Sierra Leone")
+        st.form_submit_button("Update")
+    times = get_prayer_times(city, country)
     
     if times:
         st.subheader(f"📅 Prayer Times ({city})")
-        st.markdown(f"<div class='prayer-card'>🌅 <b>Fajr (Suhoor Ends):</b> {times['Fajr']}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='prayer-card'>☀️ <b>Dhuhr:</b> {times['Dhuhr']}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='prayer-card'>🌥️ <b>Asr:</b> {times['Asr']}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='prayer-card' style='background-color:#fff3e0;'>🌙 <b>Maghrib (Iftar):</b> {times['Maghrib']}</div>", unsafe_allow_html=True)
-        st.markdown(f"<div class='prayer-card'>🌌 <b>Isha:</b> {times['Isha']}</div>", unsafe_allow_html=True)
+        st.html("".join(f"<div class='prayer-card'{style}>{label} {times[name]}</div>" for name, label, style in PRAYER_CARDS))
         
         st.warning(f"🔔 **Daily Goal Notification:**\nSet your phone's IFTTT alarm to **{times['Fajr']}** to wake up for Suhoor and read your daily verse!")
 
@@ -65,6 +192,9 @@ with st.sidebar:
     if st.button("Reset"):
         st.session_state.tasbeeh = 0
 
+with st.sidebar:
+    sidebar_hub()
+
 # --- 6. MAIN APP TABS ---
 tabs = st.tabs([
     "📖 Quran & Audio", 
@@ -78,20 +208,48 @@ tabs = st.tabs([
 # --- TAB 1: QURAN ---
 with tabs[0]:
     st.header("The Holy Quran & Audio Recitation")
-    s_num = st.number_input("Select Surah (1-114):", 1, 114, 1)
+    # Picking another surah unloads the shown text, so audio and text never disagree
+    s_num = st.number_input("Select Surah (1-114):", 1, 114, 1, on_change=unload_surah)
+    bitrate = st.selectbox("Audio quality (kbps):", [64, 128])
+    
     if st.button("Load Surah"):
-        with st.spinner("Loading verses and audio..."):
+        st.session_state.surah = s_num
+        st.session_state.reader_page = 0
+        # Warm the cache for the neighbouring surahs while this one is read
+        for n in (s_num - 1, s_num + 1):
+            if 1 <= n <= 114:
+                background_pool().submit(get_surah, n)
+
+    # Full Surah Audio Link - needs no API call, so it plays without loading the text
+    st.caption(f"🎧 Recitation of Surah {s_num}")
+    st.audio(surah_audio_url(s_num, bitrate))
+    
+    # Keep the loaded surah across reruns so paging doesn't lose it
+    if 'surah' in st.session_state:
+        loaded = st.session_state.surah
+        with st.spinner("Loading verses..."):
             try:
-                res = requests.get(f"https://api.alquran.cloud/v1/surah/{s_num}/editions/quran-uthmani,en.sahih").json()
-                st.subheader(f"{res['data'][0]['name']} - {res['data'][0]['englishName']}")
+                ar_data, en_data = get_surah(loaded)
+                st.subheader(f"{ar_data['name']} - {ar_data['englishName']}")
+                
+                # Only render one page of ayahs per rerun
+                total = len(ar_data['ayahs'])
+                last_page = (total - 1) // AYAHS_PER_PAGE
+                page = st.selectbox("Jump to ayahs:", range(last_page + 1), key="reader_page",
+                                    format_func=lambda p: f"{p * AYAHS_PER_PAGE + 1}-{min((p + 1) * AYAHS_PER_PAGE, total)}")
+                start = page * AYAHS_PER_PAGE
                 
-                # Full Surah Audio Link
-                st.audio(f"https://cdn.islamic.network/quran/audio-surah/128/ar.alafasy/{s_num}.mp3")
+                # Build the whole page server-side and send it as one block
+                st.html("".join(
+                    f"<p class='arabic-text'>{ar['text']}</p><div class='translation-text'>{en['text']}</div>"
+                    for ar, en in zip(ar_data['ayahs'][start:start + AYAHS_PER_PAGE], en_data['ayahs'][start:start + AYAHS_PER_PAGE])
+                ))
                 
-                for ar, en in zip(res['data'][0]['ayahs'], res['data'][1]['ayahs']):
-                    st.markdown(f"<p class='arabic-text'>{ar['text']}</p>", unsafe_allow_html=True)
-                    st.markdown(f"<div class='translation-text'>{en['text']}</div>", unsafe_allow_html=True)
-            except:
+                prev_col, info_col, next_col = st.columns([1, 2, 1])
+                prev_col.button("⬅️ Previous", on_click=turn_page, args=(-1,), disabled=page == 0)
+                info_col.caption(f"Page {page + 1} of {last_page + 1}")
+                next_col.button("Next ➡️", on_click=turn_page, args=(1,), disabled=page == last_page)
+            except FETCH_ERRORS:
                 st.error("Network error. Please check your internet connection.")
 
 # --- TAB 2: HISTORY & SUNNAH ---
@@ -99,12 +257,12 @@ with tabs[1]:
     st.header("📜 The Complete History of Islam")
     st.write("Islam is a monotheistic faith revealed to the Prophet Muhammad (Peace Be Upon Him) in the 7th century. It emphasizes the absolute oneness of God (Tawhid) and guides Muslims through the Quran and the Sunnah (teachings of the Prophet).")
     
-    st.markdown("""<div class='card'><h3>From Mecca to the Golden Age</h3>
+    st.html("""<div class='card'><h3>From Mecca to the Golden Age</h3>
     <ul>
         <li><b>610 CE:</b> The first revelation in the Cave of Hira.</li>
         <li><b>622 CE (The Hijrah):</b> Migration to Medina, marking year 1 of the Islamic calendar.</li>
         <li><b>The Golden Age:</b> From the 8th to 14th century, the Islamic empire became the world's center for science, medicine, algebra, and astronomy, profoundly influencing the modern world.</li>
-    </ul></div>""", unsafe_allow_html=True)
+    </ul></div>""")
     
     st.header("📖 Sunnah of the Prophet (Hadith)")
     st.info("Abu Huraira reported: The Messenger of Allah, peace and blessings be upon him, said, **'When the month of Ramadan begins, the gates of the heaven are opened, the gates of Hellfire are closed, and the devils are chained.'** (Sahih al-Bukhari)")
@@ -117,13 +275,13 @@ with tabs[2]:
     
     c1, c2 = st.columns([2, 1])
     with c1:
-        st.markdown("""<div class='card'><h3>The Rules and Spirit of Fasting (Sawm)</h3>
+        st.html("""<div class='card'><h3>The Rules and Spirit of Fasting (Sawm)</h3>
         <ul>
             <li><b>Imsak (Restraint):</b> Complete abstention from food, drink (even water), and intimacy from dawn to sunset.</li>
             <li><b>Niyyah (Intention):</b> Must be made internally before Fajr.</li>
             <li><b>Taqwa (Consciousness):</b> Fasting the stomach is easy; fasting the tongue from gossip, the eyes from unlawful sights, and the heart from anger is the true goal.</li>
             <li><b>Exemptions:</b> The sick, elderly, travelers, and pregnant/nursing women are exempt and can make it up later or pay Fidyah.</li>
-        </ul></div>""", unsafe_allow_html=True)
+        </ul></div>""")
     
     st.divider()
     st.header("🌖 Ramadan Progress Tracker")
@@ -135,13 +293,18 @@ with tabs[2]:
     st.write(f"You have completed **{int((day/30)*100)}%** of the month. You are currently in the **First 10 Days: The Days of Mercy (Rahmah)**.")
 
 # --- TAB 4: RECIPES & ZAKAT ---
-with tabs[3]:
-    st.header("💰 Zakat Calculator")
-    st.write("Zakat (2.5% of accumulated wealth) purifies your income and supports the needy.")
+# A fragment, so typing an amount doesn't rerun the sidebar and other tabs
+@st.fragment
+def zakat_calculator():
     assets = st.number_input("Enter Total Accumulated Wealth (Cash/Gold equivalent):", min_value=0.0)
     if assets > 0:
         st.success(f"**Your Zakat Due:** {assets * 0.025:,.2f}")
 
+with tabs[3]:
+    st.header("💰 Zakat Calculator")
+    st.write("Zakat (2.5% of accumulated wealth) purifies your income and supports the needy.")
+    zakat_calculator()
+
     st.divider()
     st.header("🥗 Ramadan Nutrition Guide")
     col_a, col_b = st.columns(2)
@@ -155,19 +318,10 @@ with tabs[4]:
     st.header("🧠 Quranic Vocabulary Builder")
     st.write("Listen and learn the most frequently used words in the Quran.")
     
-    vocab = [
-        {"ar": "صَبْر", "en": "Sabr (Patience/Perseverance)", "url": "https://everyayah.com/data/Arabic_Words/002153.mp3"},
-        {"ar": "رَحْمَة", "en": "Rahma (Mercy)", "url": "https://everyayah.com/data/Arabic_Words/001001.mp3"},
-        {"ar": "عَلِيم", "en": "Aleem (All-Knowing)", "url": "https://everyayah.com/data/Arabic_Words/002032.mp3"},
-        {"ar": "أَرْض", "en": "Ardh (Earth)", "url": "https://everyayah.com/data/Arabic_Words/002011.mp3"}
-    ]
+    st.html(VOCAB_HTML)
     
-    for v in vocab:
-        c1, c2, c3 = st.columns([1, 2, 2])
-        c1.markdown(f"<span class='arabic-text' style='font-size: 28px;'>{v['ar']}</span>", unsafe_allow_html=True)
-        c2.write(f"**{v['en']}**")
-        with c3:
-            st.audio(v['url'])
+    word = st.selectbox("🔊 Pronounce", VOCAB, format_func=lambda v: f"{v.arabic} - {v.meaning}")
+    st.audio(word.audio_url)
 
 # --- TAB 6: DAILY VERSE ---
 with tabs[5]:
@@ -176,10 +330,13 @@ with tabs[5]:
     if st.button("Generate My Daily Verse"):
         with st.spinner("Fetching from the heavens..."):
             try:
-                r = random.randint(1, 6236)
-                v = requests.get(f"https://api.alquran.cloud/v1/ayah/{r}/editions/quran-uthmani,en.sahih").json()
-                st.markdown(f"<p class='arabic-text'>{v['data'][0]['text']}</p>", unsafe_allow_html=True)
-                st.success(f"**Translation:** {v['data'][1]['text']}")
-                st.caption(f"Surah {v['data'][0]['surah']['englishName']}, Ayah {v['data'][0]['numberInSurah']}")
-            except:
+                st.session_state.verse = get_ayah(random.randint(1, 6236))
+            except FETCH_ERRORS:
                 st.error("Error fetching verse. Please try again.")
+    
+    # Render from session state so the verse survives unrelated reruns
+    if verse := st.session_state.get("verse"):
+        ar, en = verse
+        st.html(f"<p class='arabic-text'>{ar['text']}</p>")
+        st.success(f"**Translation:** {en['text']}")
+        st.caption(f"Surah {ar['surah']['englishName']}, Ayah {ar['numberInSurah']}")